@@ -11,6 +11,13 @@ import argparse
 import logging
 from datetime import datetime
 import re
+from functools import lru_cache
+
+# Seconds a connection waits for another writer's transaction to finish
+BUSY_TIMEOUT = 300
+
+# Matches the DATA_DATE() placeholder used by the SQL scripts
+DATA_DATE_PATTERN = re.compile(r"\bDATA_DATE\(\s*\)", re.IGNORECASE)
 
 # Configure logging
 def setup_logging(log_level="INFO", log_file=None):
@@ -39,79 +46,197 @@ def setup_logging(log_level="INFO", log_file=None):
     
     return logger
 
-def execute_sql_file(sql_file_path, db_path='seo_assessment.db', data_date=None):
+def configure_connection(conn, safe=False):
     """
-    Execute a SQL file against SQLite database.
+    Apply performance PRAGMAs to a SQLite connection.
     
     Args:
-        sql_file_path (str): Path to the SQL file to execute
+        conn (sqlite3.Connection): SQLite connection
+        safe (bool): Use synchronous=FULL instead of NORMAL for maximum durability
+    """
+    # WAL mode is persistent in the database file once enabled
+    synchronous = "FULL" if safe else "NORMAL"
+    conn.executescript(f"""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous={synchronous};
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-262144;
+        PRAGMA mmap_size=268435456;
+    """)
+
+def split_sql_statements(sql_content):
+    """
+    Split a SQL script into individual statements.
+    Semicolons inside string literals, comments and trigger bodies are respected.
+    
+    Args:
+        sql_content (str): SQL script content
+    
+    Returns:
+        list: SQL statements in script order
+    """
+    statements = []
+    current = ""
+    pieces = sql_content.split(';')
+    for i, piece in enumerate(pieces):
+        current += piece
+        if i < len(pieces) - 1:
+            current += ';'
+        # Only cut at a semicolon that actually terminates a statement
+        if sqlite3.complete_statement(current):
+            statements.append(current)
+            current = ""
+    
+    # Keep a final statement that has no terminating semicolon
+    if current.strip():
+        statements.append(current)
+    return statements
+
+@lru_cache(maxsize=32)
+def _compile_script(sql_file_path, mtime_ns):
+    """
+    Read and split a SQL file once per file version.
+    DATA_DATE() placeholders become the :data_date parameter, so the statements are the
+    same for every batch date and SQLite's statement cache can reuse their prepared plans.
+    
+    Args:
+        sql_file_path (str): Path to the SQL file to read
+        mtime_ns (int): Modification time of the file, so an edited file is read again
+    
+    Returns:
+        tuple: SQL statements in script order
+    """
+    with open(sql_file_path, 'r') as sql_file:
+        sql_content = sql_file.read()
+    return tuple(split_sql_statements(DATA_DATE_PATTERN.sub(":data_date", sql_content)))
+
+def read_sql_statements(sql_file_path):
+    """
+    Get the statements of a SQL file, reusing the cached split while the file is unchanged.
+    
+    Args:
+        sql_file_path (str): Path to the SQL file to read
+    
+    Returns:
+        tuple: SQL statements in script order, with :data_date left to be bound at execution
+    """
+    return _compile_script(sql_file_path, os.stat(sql_file_path).st_mtime_ns)
+
+def execute_sql_script(statements, script_name, db_path='seo_assessment.db', data_date=None, safe=False, conn=None):
+    """
+    Execute SQL statements against SQLite database in a single transaction.
+    
+    Args:
+        statements (list): SQL statements to execute, as returned by read_sql_statements
+        script_name (str): Name of the script, used in log messages and the result
         db_path (str): Path to the SQLite database file
         data_date (str): Batch date to use for the data_date column (YYYY-MM-DD format)
+        safe (bool): Use synchronous=FULL instead of NORMAL for maximum durability
+        conn (sqlite3.Connection): Open connection to reuse instead of connecting to db_path (optional)
     
     Returns:
         dict: Result of the query execution with status
     """
+    outer_transaction = False
+    own_connection = conn is None
     try:
-        # Check if file exists
-        if not os.path.exists(sql_file_path):
-            return {
-                "status": "error",
-                "message": f"SQL file not found: {sql_file_path}"
-            }
-        
         # Set default data_date if not provided
         if not data_date:
             data_date = datetime.now().strftime('%Y-%m-%d')
-            
-        # Read SQL content from file
-        with open(sql_file_path, 'r') as sql_file:
-            sql_content = sql_file.read()
-            
-        # Add SQL variable declarations for data_date and run_date
-        # These can be referenced in SQL scripts as :data_date and CURRENT_TIMESTAMP
-        variable_declarations = f"""
--- Set data_date parameter to '{data_date}'
-"""
-        # Combine the variable declarations with the original SQL content
-        sql_content = variable_declarations + sql_content
         
-        # Connect to SQLite database
-        conn = sqlite3.connect(db_path)
-        
-        # Enable parameter substitution
-        conn.create_function("DATA_DATE", 0, lambda: data_date)
+        # Connect to SQLite database unless the caller supplied a connection
+        if own_connection:
+            conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+            configure_connection(conn, safe)
         
         cursor = conn.cursor()
         
-        logging.info(f"Executing SQL file: {sql_file_path}")
         logging.info(f"Using database: {db_path}")
         logging.info(f"Using data_date: {data_date}")
         
-        # Execute the query with parameter binding
-        cursor.executescript(sql_content)
+        # Execute each statement in a single transaction with :data_date bound as a parameter;
+        # inside a transaction the caller already opened, use a savepoint and leave the commit to the caller
+        outer_transaction = conn.in_transaction
+        cursor.execute("SAVEPOINT sql_file" if outer_transaction else "BEGIN IMMEDIATE")
+        parameters = {"data_date": data_date}
+        for statement in statements:
+            cursor.execute(statement, parameters)
         
         # Commit changes
-        conn.commit()
+        if outer_transaction:
+            cursor.execute("RELEASE SAVEPOINT sql_file")
+        else:
+            conn.commit()
         
-        # Close connection
-        conn.close()
+        # Close connection if we opened it
+        if own_connection:
+            conn.close()
         
-        logging.info(f"SQL execution completed successfully: {os.path.basename(sql_file_path)}")
+        logging.info(f"SQL execution completed successfully: {os.path.basename(script_name)}")
         return {
             "status": "success",
-            "file_name": os.path.basename(sql_file_path),
+            "file_name": os.path.basename(script_name),
             "data_date": data_date
         }
         
     except Exception as e:
         error_message = str(e)
-        logging.error(f"Error executing SQL {sql_file_path}: {error_message}")
+        logging.error(f"Error executing SQL {script_name}: {error_message}")
+        
+        # Roll back any statements that ran before the failure
+        if conn is not None and conn.in_transaction:
+            if outer_transaction:
+                conn.execute("ROLLBACK TO SAVEPOINT sql_file")
+                conn.execute("RELEASE SAVEPOINT sql_file")
+            else:
+                conn.rollback()
+        
+        # Close connection if we opened it
+        if own_connection and conn is not None:
+            conn.close()
         
         return {
             "status": "error",
             "message": error_message,
+            "file_name": os.path.basename(script_name) if script_name else "unknown"
+        }
+
+def execute_sql_file(sql_file_path, db_path='seo_assessment.db', data_date=None, safe=False, conn=None):
+    """
+    Execute a SQL file against SQLite database.
+    
+    Args:
+        sql_file_path (str): Path to the SQL file to execute
+        db_path (str): Path to the SQLite database file
+        data_date (str): Batch date to use for the data_date column (YYYY-MM-DD format)
+        safe (bool): Use synchronous=FULL instead of NORMAL for maximum durability
+        conn (sqlite3.Connection): Open connection to reuse instead of connecting to db_path (optional)
+    
+    Returns:
+        dict: Result of the query execution with status
+    """
+    # Set default data_date if not provided
+    if not data_date:
+        data_date = datetime.now().strftime('%Y-%m-%d')
+    
+    # Read SQL statements from file
+    try:
+        statements = read_sql_statements(sql_file_path)
+    except FileNotFoundError:
+        return {
+            "status": "error",
+            "message": f"SQL file not found: {sql_file_path}"
+        }
+    except Exception as e:
+        logging.error(f"Error reading SQL {sql_file_path}: {e}")
+        return {
+            "status": "error",
+            "message": str(e),
             "file_name": os.path.basename(sql_file_path) if sql_file_path else "unknown"
         }
+    
+    logging.info(f"Executing SQL file: {sql_file_path}")
+    return execute_sql_script(statements, sql_file_path, db_path, data_date, safe, conn)
 
 def main():
     parser = argparse.ArgumentParser(description='Execute SQLite SQL files')
@@ -120,12 +245,13 @@ def main():
     parser.add_argument('--data-date', help='Batch date for the data_date column (YYYY-MM-DD format)')
     parser.add_argument('--log-level', default='INFO', help='Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)')
     parser.add_argument('--log-file', help='Path to log file (optional)')
+    parser.add_argument('--safe', action='store_true', help='Use synchronous=FULL for maximum durability')
     args = parser.parse_args()
     
     # Setup logging
     setup_logging(args.log_level, args.log_file)
     
-    result = execute_sql_file(args.sql_file, args.db, args.data_date)
+    result = execute_sql_file(args.sql_file, args.db, args.data_date, args.safe)
     
     if result["status"] == "success":
         logging.info("SQL execution completed successfully")
@@ -10,7 +10,6 @@ This script:
 
 import os
 import sys
-import glob
 import hashlib
 import argparse
 import sqlite3
@@ -19,6 +18,20 @@ import logging
 # uuid import is not needed
 from datetime import datetime
 
+# pyarrow is optional; when installed it is used to parse CSV files
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+    pacsv = None
+
+# Read buffer for CSV files (1 MiB) to cut down on read syscalls
+CSV_READ_BUFFER_SIZE = 1 << 20
+
+# Seconds a connection waits for another writer's transaction to finish
+BUSY_TIMEOUT = 300
+
 # Configure logging
 def setup_logging(log_level="INFO", log_file=None):
     """Configure logging with the specified level and optional file output."""
@@ -46,91 +59,295 @@ def setup_logging(log_level="INFO", log_file=None):
     
     return logger
 
+def configure_connection(conn, safe=False):
+    """
+    Apply performance PRAGMAs to a SQLite connection.
+    
+    Args:
+        conn (sqlite3.Connection): SQLite connection
+        safe (bool): Use synchronous=FULL instead of NORMAL for maximum durability
+    """
+    # WAL mode is persistent in the database file once enabled
+    synchronous = "FULL" if safe else "NORMAL"
+    conn.executescript(f"""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous={synchronous};
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-262144;
+        PRAGMA mmap_size=268435456;
+    """)
+
 def get_file_id(file_path):
     """
-    Generate a file_id based on the file name using MD5 hash.
+    Generate a file_id based on the file name using a 128-bit BLAKE2b hash.
     
     Args:
         file_path (str): Path to the file
     
     Returns:
-        str: MD5 hash of the file name
+        str: BLAKE2b hash of the file name
     """
     file_name = os.path.basename(file_path)
-    return hashlib.md5(file_name.encode()).hexdigest()
+    return hashlib.blake2b(file_name.encode(), digest_size=16).hexdigest()
 
 def get_already_ingested_files(conn):
     """
-    Get a list of files that have already been ingested successfully.
+    Get the set of files that have already been ingested successfully.
     
     Args:
         conn (sqlite3.Connection): SQLite connection
     
     Returns:
-        list: List of file_name values from log_file_dtl with completed status
+        set: Set of file_name values from log_file_dtl with completed status
     """
     try:
         cursor = conn.cursor()
         cursor.execute("SELECT file_name FROM log_file_dtl WHERE status = 'completed'")
-        results = cursor.fetchall()
         
-        # Extract file names from the query results
-        ingested_files = [row[0] for row in results]
+        # Stream file names from the cursor into a set for fast lookups
+        ingested_files = {row[0] for row in cursor}
         return ingested_files
     except Exception as e:
         logging.warning(f"Could not query log_file_dtl table: {e}")
         logging.debug("This may be normal if the table doesn't exist yet.")
-        return []
+        return set()
 
-def log_ingestion(conn, file_path, status, data_date=None):
+def log_ingestions(conn, entries, data_date=None, run_date=None):
     """
-    Log file ingestion in the log_file_dtl table.
+    Log file ingestions in the log_file_dtl table with a single batched insert.
+    The caller owns the transaction and is responsible for committing.
     
     Args:
         conn (sqlite3.Connection): SQLite connection
-        file_path (str): Path to the file
-        status (str): Status of the ingestion (completed or failed)
+        entries (list): (file_path, status) tuples, where status is completed or failed
         data_date (str): Batch date for the data_date column (YYYY-MM-DD format)
+        run_date (str): Timestamp of the ingestion run, used for created_ts and run_date
     """
     try:
         cursor = conn.cursor()
-        file_id = get_file_id(file_path)
-        file_name = file_path
-        current_time = datetime.now().isoformat()
         user = "admin"
         
         # Use current date for data_date if not provided
         if not data_date:
             data_date = datetime.now().strftime('%Y-%m-%d')
         
-        # Current timestamp for run_date
-        run_date = datetime.now().isoformat()
+        # Current timestamp for run_date if not provided
+        if not run_date:
+            run_date = datetime.now().isoformat()
+        current_time = run_date
         
-        cursor.execute(
+        log_rows = [
+            (get_file_id(file_path), file_path, status, current_time, user, data_date, run_date)
+            for file_path, status in entries
+        ]
+        cursor.executemany(
             "INSERT INTO log_file_dtl (file_id, file_name, status, created_ts, created_user, data_date, run_date) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (file_id, file_name, status, current_time, user, data_date, run_date)
+            log_rows
         )
-        conn.commit()
-        logging.info(f"Logged {status} ingestion for {file_name} in log_file_dtl table (data_date: {data_date})")
+        for file_path, status in entries:
+            logging.info(f"Logged {status} ingestion for {file_path} in log_file_dtl table (data_date: {data_date})")
     except Exception as e:
         logging.warning(f"Could not log to log_file_dtl table: {e}")
         logging.debug("This may be normal if the table doesn't exist yet.")
 
-def get_column_names(file_path):
+def get_log_status(result):
+    """
+    Map a file ingestion result to its log_file_dtl status.
+    
+    Args:
+        result (dict): Result returned by ingest_file
+    
+    Returns:
+        str: completed for successful files, failed otherwise
+    """
+    return "completed" if result["status"] == "success" else "failed"
+
+def load_csv_extension(conn, extension_path):
+    """
+    Load SQLite's csv virtual table extension into a connection.
+    
+    Args:
+        conn (sqlite3.Connection): SQLite connection
+        extension_path (str): Path to the compiled csv extension (e.g. csv.so)
+    
+    Returns:
+        bool: True if the extension was loaded, False otherwise
+    """
+    if not extension_path:
+        return False
+    try:
+        conn.enable_load_extension(True)
+        conn.load_extension(extension_path)
+        conn.enable_load_extension(False)
+        logging.info(f"Loaded SQLite csv extension from {extension_path}")
+        return True
+    except Exception as e:
+        # Python builds without extension support have no enable_load_extension
+        logging.warning(f"Could not load SQLite csv extension {extension_path}: {e}")
+        logging.info("Falling back to Python CSV parsing.")
+        return False
+
+def insert_csv_natively(cursor, file_path, table_name, insert_columns, audit_values):
+    """
+    Insert a CSV file into a table through the csv virtual table so parsing and
+    inserting both run inside SQLite.
+    
+    Args:
+        cursor (sqlite3.Cursor): SQLite cursor with the csv extension loaded
+        file_path (str): Path to the CSV file
+        table_name (str): Name of the SQLite table
+        insert_columns (list): Target columns, CSV columns followed by audit columns
+        audit_values (list): Values appended to every row for the audit columns
+    """
+    file_name = file_path.replace("'", "''")
+    cursor.execute(f"CREATE VIRTUAL TABLE temp.csv_import USING csv(filename='{file_name}', header=YES)")
+    try:
+        audit_placeholders = ''.join([', ?' for _ in audit_values])
+        cursor.execute(
+            f"INSERT INTO {table_name} ({', '.join(insert_columns)}) SELECT *{audit_placeholders} FROM temp.csv_import",
+            audit_values
+        )
+    finally:
+        cursor.execute("DROP TABLE temp.csv_import")
+
+def ingest_file(conn, file_path, table_name, table_columns, insert_statements, data_date, run_date, native_csv=False):
+    """
+    Ingest a single CSV file inside a savepoint, so the caller must already have
+    a transaction open. The caller logs the outcome in the log_file_dtl table.
+    
+    Args:
+        conn (sqlite3.Connection): SQLite connection in autocommit mode
+        file_path (str): Path to the CSV file
+        table_name (str): Name of the SQLite table
+        table_columns (list): Column names of the SQLite table
+        insert_statements (dict): Cache of prepared INSERT statements keyed by CSV header
+        data_date (str): Batch date for the data_date column (YYYY-MM-DD format)
+        run_date (str): Timestamp of the ingestion run for the run_date column
+        native_csv (bool): Whether the csv virtual table extension is loaded
+    
+    Returns:
+        dict: Result of the file ingestion
+    """
+    cursor = conn.cursor()
+    
+    # Savepoint lets a failed file roll back without losing the others
+    cursor.execute("SAVEPOINT ingest_file")
+    try:
+        logging.info(f"Ingesting {file_path} to {table_name}")
+        
+        # Determine if we need to add audit columns
+        has_audit_columns = 'data_date' in table_columns
+        
+        # Read CSV file
+        with open(file_path, 'r', newline='', buffering=CSV_READ_BUFFER_SIZE, encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader)  # Get column names from the header row
+            columns = [column.lstrip('\ufeff').strip() for column in header]
+            
+            # Build the INSERT once per header and reuse it for later files
+            if tuple(columns) not in insert_statements:
+                # The header must name exactly the table's data columns, in any order and case
+                data_columns = [column for column in table_columns if not (has_audit_columns and column in ('data_date', 'run_date'))]
+                table_spelling = {column.casefold(): column for column in data_columns}
+                if sorted(column.casefold() for column in columns) != sorted(table_spelling):
+                    raise ValueError(f"CSV header {columns} does not match the columns of {table_name}: {data_columns}")
+                
+                # CSV columns map onto table columns by header name, using the table's spelling
+                insert_columns = [table_spelling[column.casefold()] for column in columns]
+                if has_audit_columns:
+                    insert_columns += ['data_date', 'run_date']
+                placeholders = ', '.join(['?' for _ in insert_columns])
+                insert_sql = f"INSERT INTO {table_name} ({', '.join(insert_columns)}) VALUES ({placeholders})"
+                insert_statements[tuple(columns)] = (insert_columns, insert_sql)
+            insert_columns, insert_sql = insert_statements[tuple(columns)]
+            
+            # We have audit columns - add data_date and run_date to each row
+            audit_values = [data_date, run_date] if has_audit_columns else []
+            
+            if native_csv:
+                # Let SQLite parse and insert the file without a Python row loop
+                insert_csv_natively(cursor, file_path, table_name, insert_columns, audit_values)
+            elif pacsv is not None:
+                # Parse with pyarrow and insert one record batch at a time
+                insert_csv_with_pyarrow(cursor, file_path, header, insert_sql, audit_values)
+            else:
+                # Stream rows from the reader in a single executemany call
+                rows = (row + audit_values for row in reader) if audit_values else reader
+                cursor.executemany(insert_sql, rows)
+        
+        cursor.execute("RELEASE SAVEPOINT ingest_file")
+        
+        logging.info(f"Loaded data into {table_name}")
+        return {
+            "file": file_path,
+            "status": "success"
+        }
+        
+    except Exception as e:
+        error_message = str(e)
+        logging.error(f"Error ingesting {file_path}: {error_message}")
+        
+        # Discard any rows inserted for this file
+        cursor.execute("ROLLBACK TO SAVEPOINT ingest_file")
+        cursor.execute("RELEASE SAVEPOINT ingest_file")
+        
+        return {
+            "file": file_path,
+            "status": "error",
+            "message": error_message
+        }
+
+def insert_csv_with_pyarrow(cursor, file_path, columns, insert_sql, audit_values):
     """
-    Get column names from the CSV file.
+    Insert a CSV file using pyarrow's C++ CSV reader for parsing.
+    Every column is read as a string so SQLite applies the same type affinity
+    as it does for rows from the csv module.
     
     Args:
+        cursor (sqlite3.Cursor): SQLite cursor
         file_path (str): Path to the CSV file
+        columns (list): Column names from the CSV header row
+        insert_sql (str): Prepared INSERT statement for the file
+        audit_values (list): Values appended to every row for the audit columns
+    """
+    convert_options = pacsv.ConvertOptions(column_types={column: pa.string() for column in columns})
+    read_options = pacsv.ReadOptions(block_size=CSV_READ_BUFFER_SIZE)
+    reader = pacsv.open_csv(file_path, read_options=read_options, convert_options=convert_options)
+    
+    audit_tuple = tuple(audit_values)
+    for batch in reader:
+        # Turn the columnar batch back into rows for executemany
+        column_values = [column.to_pylist() for column in batch.columns]
+        cursor.executemany(insert_sql, (row + audit_tuple for row in zip(*column_values)))
+
+def drop_secondary_indexes(conn, table_name):
+    """
+    Drop the non-unique, user-created indexes on a table ahead of a bulk load.
+    
+    Args:
+        conn (sqlite3.Connection): SQLite connection
+        table_name (str): Name of the SQLite table
     
     Returns:
-        list: List of column names
+        list: CREATE INDEX statements needed to rebuild the dropped indexes
     """
-    with open(file_path, 'r', newline='') as csvfile:
-        reader = csv.reader(csvfile)
-        return next(reader)  # Get the header row
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA index_list({table_name})")
+    
+    # Keep unique indexes and those backing constraints (origin 'u' or 'pk')
+    index_names = [row[1] for row in cursor.fetchall() if not row[2] and row[3] == 'c']
+    
+    index_statements = []
+    for index_name in index_names:
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,))
+        index_statements.append(cursor.fetchone()[0])
+        cursor.execute(f"DROP INDEX {index_name}")
+    
+    if index_statements:
+        logging.info(f"Dropped {len(index_statements)} indexes on {table_name} for bulk load")
+    return index_statements
 
-def ingest_csv_to_sqlite(directory_path, file_prefix, table_name, db_path='seo_assessment.db', data_date=None):
+def ingest_csv_to_sqlite(directory_path, file_prefix, table_name, db_path='seo_assessment.db', data_date=None, safe=False, csv_extension=None, fast_load=False):
     """
     Find and ingest matching CSV files to a SQLite table if they haven't been ingested already.
     
@@ -140,6 +357,9 @@ def ingest_csv_to_sqlite(directory_path, file_prefix, table_name, db_path='seo_a
         table_name (str): Name of the SQLite table
         db_path (str): Path to the SQLite database file
         data_date (str): Batch date for the data_date column (YYYY-MM-DD format)
+        safe (bool): Use synchronous=FULL instead of NORMAL for maximum durability
+        csv_extension (str): Path to SQLite's csv extension for native imports (optional)
+        fast_load (bool): Drop secondary indexes during the load and rebuild them afterwards
     
     Returns:
         dict: Result of the ingestion
@@ -147,9 +367,13 @@ def ingest_csv_to_sqlite(directory_path, file_prefix, table_name, db_path='seo_a
     # Use current date for data_date if not provided
     if not data_date:
         data_date = datetime.now().strftime('%Y-%m-%d')
+    
+    # Timestamp shared by every row and log entry written in this run
+    run_date = datetime.now().isoformat()
+    conn = None
     try:
         # Check if directory exists
-        if not os.path.exists(directory_path) or not os.path.isdir(directory_path):
+        if not os.path.isdir(directory_path):
             return {
                 "status": "error",
                 "message": f"Directory not found: {directory_path}"
@@ -157,7 +381,11 @@ def ingest_csv_to_sqlite(directory_path, file_prefix, table_name, db_path='seo_a
         
         # Find matching CSV files
         file_pattern = os.path.join(directory_path, f"{file_prefix}*.csv")
-        matching_files = glob.glob(file_pattern)
+        with os.scandir(directory_path) as entries:
+            matching_files = sorted(
+                entry.path for entry in entries
+                if entry.name.startswith(file_prefix) and entry.name.endswith('.csv') and entry.is_file()
+            )
         
         if not matching_files:
             return {
@@ -165,17 +393,21 @@ def ingest_csv_to_sqlite(directory_path, file_prefix, table_name, db_path='seo_a
                 "message": f"No files matching pattern {file_pattern} found"
             }
         
-        # Connect to SQLite database
-        conn = sqlite3.connect(db_path)
+        # Connect to SQLite database, waiting on any other writer that holds the lock
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+        configure_connection(conn, safe)
+        
+        # Manage transactions explicitly so the whole batch commits once
+        conn.isolation_level = None
+        
+        # Use SQLite's csv virtual table when the extension is available
+        native_csv = load_csv_extension(conn, csv_extension)
         
         # Get list of already ingested files
         ingested_files = get_already_ingested_files(conn)
         
         # Filter out already ingested files
-        new_files = []
-        for file_path in matching_files:
-            if file_path not in ingested_files:
-                new_files.append(file_path)
+        new_files = [file_path for file_path in matching_files if file_path not in ingested_files]
         
         if not new_files:
             conn.close()
@@ -188,81 +420,44 @@ def ingest_csv_to_sqlite(directory_path, file_prefix, table_name, db_path='seo_a
         
         logging.info(f"Found {len(new_files)} new files to ingest out of {len(matching_files)} matching files")
         
-        success_count = 0
-        error_count = 0
-        results = []
+        # Get table schema once to determine the total number of columns needed
+        cursor = conn.cursor()
+        cursor.execute(f"PRAGMA table_info({table_name})")
+        table_columns = [col[1] for col in cursor.fetchall()]
+        if not table_columns:
+            raise sqlite3.OperationalError(f"no such table: {table_name}")
         
-        # Process each new file
-        for file_path in new_files:
-            try:
-                logging.info(f"Ingesting {file_path} to {table_name}")
-                
-                # Get column names from the CSV file
-                columns = get_column_names(file_path)
-                
-                # Create cursor
-                cursor = conn.cursor()
-                
-                # Read CSV file
-                with open(file_path, 'r', newline='') as csvfile:
-                    reader = csv.reader(csvfile)
-                    next(reader)  # Skip the header row
-                    
-                    # Prepare placeholders for the SQL query (including audit columns)
-                    csv_placeholders = ', '.join(['?' for _ in columns])
-                    
-                    # Get table schema to determine the total number of columns needed
-                    cursor.execute(f"PRAGMA table_info({table_name})")
-                    table_columns = cursor.fetchall()
-                    
-                    # Determine if we need to add audit columns
-                    has_audit_columns = any(col[1] == 'data_date' for col in table_columns)
-                    
-                    if has_audit_columns:
-                        # We have audit columns - need to add values for data_date and run_date
-                        run_date = datetime.now().isoformat()
-                        
-                        # Insert data row by row with audit columns
-                        for row in reader:
-                            # Add data_date and run_date to each row
-                            full_row = list(row) + [data_date, run_date]
-                            all_placeholders = csv_placeholders + ', ?, ?'
-                            cursor.execute(f"INSERT INTO {table_name} VALUES ({all_placeholders})", full_row)
-                    else:
-                        # No audit columns - just insert the data as is
-                        for row in reader:
-                            cursor.execute(f"INSERT INTO {table_name} VALUES ({csv_placeholders})", row)
-                
-                # Commit changes
-                conn.commit()
-                
-                # Log successful ingestion
-                log_ingestion(conn, file_path, "completed", data_date)
-                
-                success_count += 1
-                results.append({
-                    "file": file_path,
-                    "status": "success"
-                })
-                
-                logging.info(f"Loaded data into {table_name}")
-                
-            except Exception as e:
-                error_message = str(e)
-                logging.error(f"Error ingesting {file_path}: {error_message}")
-                
-                # Log failed ingestion
-                try:
-                    log_ingestion(conn, file_path, "failed", data_date)
-                except Exception:
-                    pass  # Ignore errors in logging failure
-                
-                error_count += 1
-                results.append({
-                    "file": file_path,
-                    "status": "error",
-                    "message": error_message
-                })
+        # Prepared INSERT statements keyed by CSV header
+        insert_statements = {}
+        
+        # Drop secondary indexes for the duration of the bulk load
+        dropped_indexes = drop_secondary_indexes(conn, table_name) if fast_load else []
+        
+        try:
+            # Open a single write transaction for all files
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            # Process each new file
+            results = []
+            for file_path in new_files:
+                results.append(ingest_file(conn, file_path, table_name, table_columns, insert_statements, data_date, run_date, native_csv))
+            
+            # Log every file in one batch, in the same transaction as the data
+            log_ingestions(conn, [(result["file"], get_log_status(result)) for result in results], data_date, run_date)
+            
+            # Commit all ingested files and their log entries at once
+            cursor.execute("COMMIT")
+        finally:
+            # Rebuild any indexes dropped for the bulk load
+            if dropped_indexes:
+                if conn.in_transaction:
+                    conn.rollback()
+                for index_sql in dropped_indexes:
+                    cursor.execute(index_sql)
+                logging.info(f"Recreated {len(dropped_indexes)} indexes on {table_name}")
+        
+        success_count = sum(1 for result in results if result["status"] == "success")
+        error_count = len(results) - success_count
         
         # Close connection
         conn.close()
@@ -294,6 +489,12 @@ def ingest_csv_to_sqlite(directory_path, file_prefix, table_name, db_path='seo_a
         error_message = str(e)
         logging.error(f"Error during ingestion process: {error_message}")
         
+        # Roll back anything left uncommitted by the failure
+        if conn is not None:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.close()
+        
         return {
             "status": "error",
             "message": error_message
@@ -308,12 +509,15 @@ def main():
     parser.add_argument('--data-date', help='Batch date for the data_date column (YYYY-MM-DD format)')
     parser.add_argument('--log-level', default='INFO', help='Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)')
     parser.add_argument('--log-file', help='Path to log file (optional)')
+    parser.add_argument('--safe', action='store_true', help='Use synchronous=FULL for maximum durability')
+    parser.add_argument('--csv-extension', help='Path to the SQLite csv extension for native imports (optional)')
+    parser.add_argument('--fast-load', action='store_true', help='Drop secondary indexes during the load and rebuild them afterwards')
     args = parser.parse_args()
     
     # Setup logging
     setup_logging(args.log_level, args.log_file)
     
-    result = ingest_csv_to_sqlite(args.directory_path, args.file_prefix, args.table_name, args.db, args.data_date)
+    result = ingest_csv_to_sqlite(args.directory_path, args.file_prefix, args.table_name, args.db, args.data_date, args.safe, args.csv_extension, args.fast_load)
     
     if result["status"] == "success":
         logging.info("CSV ingestion completed successfully")
@@ -13,12 +13,18 @@ Do NOT run this script as part of the regular ETL process - it is separate by de
 
 import os
 import sys
-import glob
 import argparse
 import logging
+import sqlite3
 import yaml
 from datetime import datetime
-from Utilities.execute_sqlite_sql import execute_sql_file
+from Utilities.execute_sqlite_sql import execute_sql_file, configure_connection
+
+# Parse YAML with libyaml's C loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
 
 # Setup logging
 def setup_logging(log_level, log_file=None):
@@ -52,21 +58,24 @@ def load_config(config_path='config.yml'):
     """Load configuration from YAML file."""
     try:
         with open(config_path, 'r') as config_file:
-            return yaml.safe_load(config_file)
+            return yaml.load(config_file, Loader=YamlLoader)
     except Exception as e:
         logging.error(f"Failed to load configuration from {config_path}: {e}")
         sys.exit(1)
 
 # Create database schema
 def create_schema(config, data_date=None):
-    """Create database schema by executing all DDL scripts."""
+    """Create database schema by executing all DDL scripts over a single connection."""
     logging.info("Creating database schema...")
     
     db_path = config['database']['path']
     ddl_dir = config['sql']['ddl_dir']
     
     # Get all DDL scripts
-    ddl_scripts = glob.glob(os.path.join(ddl_dir, "*.sql"))
+    ddl_scripts = []
+    if os.path.isdir(ddl_dir):
+        with os.scandir(ddl_dir) as entries:
+            ddl_scripts = [entry.path for entry in entries if entry.name.endswith('.sql') and entry.is_file()]
     
     if not ddl_scripts:
         logging.warning(f"No DDL scripts found in {ddl_dir}")
@@ -77,13 +86,20 @@ def create_schema(config, data_date=None):
     
     logging.info(f"Found {len(ddl_scripts)} DDL scripts to execute")
     
+    # Open one connection for the whole run instead of one per script
+    conn = sqlite3.connect(db_path)
+    configure_connection(conn)
+    
     # Execute each script
     success_count = 0
-    for script in ddl_scripts:
-        logging.info(f"Executing DDL script: {os.path.basename(script)}")
-        result = execute_sql_file(script, db_path, data_date)
-        if result["status"] == "success":
-            success_count += 1
+    try:
+        for script in ddl_scripts:
+            logging.info(f"Executing DDL script: {os.path.basename(script)}")
+            result = execute_sql_file(script, db_path, data_date, conn=conn)
+            if result["status"] == "success":
+                success_count += 1
+    finally:
+        conn.close()
     
     if success_count == len(ddl_scripts):
         logging.info("All schema creation scripts executed successfully")
@@ -17,14 +17,45 @@ import sys
 import argparse
 import logging
 import yaml
-import glob
 import csv
 import sqlite3
 from datetime import datetime
 import hashlib
 import traceback
+from types import SimpleNamespace
 from Utilities.ingest_csv_to_sqlite import ingest_csv_to_sqlite as util_ingest_csv_to_sqlite
-from Utilities.execute_sqlite_sql import execute_sql_file
+from Utilities.execute_sqlite_sql import execute_sql_file, execute_sql_script, read_sql_statements, configure_connection, BUSY_TIMEOUT
+
+# Parse YAML with libyaml's C loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+# pyarrow and the ADBC SQLite driver are optional; together they enable Arrow-based CSV and Parquet exports
+try:
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+    import adbc_driver_sqlite.dbapi as adbc_sqlite
+except ImportError:
+    pacsv = None
+    pq = None
+    adbc_sqlite = None
+
+# NumPy and Numba are optional; together they let export post-processing hooks run as compiled code
+try:
+    import numpy as np
+    from numba.extending import is_jitted
+except ImportError:
+    np = None
+    is_jitted = None
+
+# Rows fetched from SQLite and written to CSV per batch during export
+EXPORT_BATCH_SIZE = 10000
+
+# Read-only export tuning: map up to 1 GiB of the database file and keep a 256 MiB page cache.
+# Memory-mapped I/O is only safe when the database is on a local filesystem, not a network share.
+EXPORT_PRAGMAS = ("PRAGMA mmap_size=1073741824", "PRAGMA cache_size=-262144")
 
 # Setup logging
 def setup_logging(log_level, log_file=None):
@@ -58,108 +89,398 @@ def load_config(config_path='config.yml'):
     """Load configuration from YAML file."""
     try:
         with open(config_path, 'r') as config_file:
-            return yaml.safe_load(config_file)
+            return yaml.load(config_file, Loader=YamlLoader)
     except Exception as e:
-        logging.error(f"Failed to load configuration from {config_path}: {e}")
+        logging.error("Failed to load configuration from %s: %s", config_path, e)
         sys.exit(1)
 
+# Resolve pipeline settings
+def get_pipeline_settings(config):
+    """Resolve the configuration values used by the pipeline steps into a namespace, once per run."""
+    processing = config.get('processing', {})
+    input_config = config['input']
+    sql_config = config['sql']
+    output_config = config['output']
+    
+    return SimpleNamespace(
+        db_path=config['database']['path'],
+        data_dir=input_config['data_dir'],
+        gsc_dir=os.path.join(input_config['data_dir'], input_config['gsc_dir']),
+        gsc_prefix=input_config['gsc_prefix'],
+        analytics_dir=os.path.join(input_config['data_dir'], input_config['analytics_dir']),
+        analytics_prefix=input_config['analytics_prefix'],
+        rank_dir=os.path.join(input_config['data_dir'], input_config['rank_dir']),
+        rank_prefix=input_config['rank_prefix'],
+        data_date=processing.get('data_date'),
+        incremental=processing.get('incremental', False),
+        fused_stages=processing.get('fused_stages', False),
+        transform_gsc=os.path.join(sql_config['transform_dir'], sql_config['transform_gsc']),
+        transform_analytics=os.path.join(sql_config['transform_dir'], sql_config['transform_analytics']),
+        transform_rank=os.path.join(sql_config['transform_dir'], sql_config['transform_rank']),
+        join_gsc_analytics=os.path.join(sql_config['join_dir'], sql_config['join_gsc_analytics']),
+        join_gsc_rank=os.path.join(sql_config['join_dir'], sql_config['join_gsc_rank']),
+        fact_seo=os.path.join(sql_config['fact_dir'], sql_config['fact_seo']),
+        export_csv=output_config.get('export_csv', False),
+        export_csv_arrow=output_config.get('export_csv_arrow', False),
+        export_parquet=output_config.get('export_parquet', False),
+        export_dir=output_config['export_dir'],
+    )
+
 # Note: We're now using the execute_sql_file function from Utilities.execute_sqlite_sql instead
 # This provides a unified SQL execution mechanism across the project
 
 # These functions have been replaced by utility modules imported from Utilities
 
-# Run transformation scripts
-def run_transformations(config, data_date=None):
-    """Run all transformation SQL scripts."""
-    db_path = config['database']['path']
-    transform_dir = config['sql']['transform_dir']
+# Incremental cache tables, created on first use so an existing database needs no schema rebuild
+CACHE_TABLE_STATEMENTS = (
+    """CREATE TABLE IF NOT EXISTS pipeline_run_cache (
+        script_name TEXT,
+        data_date TEXT,
+        cache_key TEXT,
+        status TEXT,
+        run_date TIMESTAMP,
+        PRIMARY KEY (script_name, data_date)
+    )""",
+    """CREATE TABLE IF NOT EXISTS pipeline_table_generation (
+        table_name TEXT,
+        data_date TEXT,
+        generation INTEGER,
+        run_date TIMESTAMP,
+        PRIMARY KEY (table_name, data_date)
+    )""",
+)
+
+# Compute the incremental cache key of a SQL script
+def get_script_cache_key(conn, sql_file_path, data_date, input_tables):
+    """Hash the SQL script, the batch date and the state of each input table for that date."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(sql_file_path, 'rb') as sql_file:
+        h.update(sql_file.read())
+    h.update(data_date.encode())
+    
+    for table_name in input_tables:
+        # Tables written by pipeline scripts carry a generation that is bumped on every rewrite;
+        # a rewrite reuses the same rowids, so row counts and rowids can't reveal it
+        row = conn.execute(
+            "SELECT generation FROM pipeline_table_generation WHERE table_name = ? AND data_date = ?", (table_name, data_date)
+        ).fetchone()
+        if row is not None:
+            state = f"generation {row[0]}"
+        else:
+            # Staging tables are only appended to by ingestion, so new rows change their count and max rowid
+            row_count, max_rowid = conn.execute(
+                f"SELECT COUNT(*), MAX(rowid) FROM {table_name} WHERE data_date = ?", (data_date,)
+            ).fetchone()
+            state = f"{row_count}:{max_rowid}"
+        h.update(f"|{table_name}:{state}".encode())
+    
+    return h.hexdigest()
+
+# Run a SQL script, skipping it when its inputs are unchanged since its last successful run
+def run_sql_script(sql_file_path, db_path, data_date, conn=None, input_tables=None, output_tables=()):
+    """
+    Run a SQL script; when input_tables is given, consult pipeline_run_cache and skip on a cache hit.
     
-    # Get all transformation scripts
+    Args:
+        sql_file_path (str): Path to the SQL file to execute
+        db_path (str): Path to the SQLite database file
+        data_date (str): Batch date for processing (YYYY-MM-DD format)
+        conn (sqlite3.Connection): Open connection to reuse (optional)
+        input_tables (list): Tables the script reads, or None to always run it without caching
+        output_tables (tuple): Tables the script rewrites, whose generation is bumped after a run
+    
+    Returns:
+        dict: Result of the script execution with status
+    """
+    if input_tables is None:
+        return execute_sql_file(sql_file_path, db_path, data_date, conn=conn)
+    
+    own_connection = conn is None
+    if own_connection:
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        configure_connection(conn)
+    
+    try:
+        for statement in CACHE_TABLE_STATEMENTS:
+            conn.execute(statement)
+        
+        script_name = os.path.basename(sql_file_path)
+        cache_key = get_script_cache_key(conn, sql_file_path, data_date, input_tables)
+        
+        cached = conn.execute(
+            "SELECT 1 FROM pipeline_run_cache WHERE script_name = ? AND data_date = ? AND cache_key = ? AND status = 'success'",
+            (script_name, data_date, cache_key)
+        ).fetchone()
+        if cached:
+            logging.info("Cache hit, skipping SQL file: %s", script_name)
+            return {"status": "success", "file_name": script_name, "data_date": data_date, "cached": True}
+        
+        result = execute_sql_file(sql_file_path, db_path, data_date, conn=conn)
+        
+        # Record the key only for successful runs so failed scripts are retried, and
+        # bump the generation of every table the script rewrote so downstream keys change
+        if result["status"] == "success":
+            run_date = datetime.now().isoformat()
+            conn.execute(
+                "INSERT OR REPLACE INTO pipeline_run_cache (script_name, data_date, cache_key, status, run_date) VALUES (?, ?, ?, ?, ?)",
+                (script_name, data_date, cache_key, "success", run_date)
+            )
+            conn.executemany(
+                "INSERT INTO pipeline_table_generation (table_name, data_date, generation, run_date) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (table_name, data_date) DO UPDATE SET generation = generation + 1, run_date = excluded.run_date",
+                [(table_name, data_date, run_date) for table_name in output_tables]
+            )
+        return result
+    finally:
+        if own_connection:
+            conn.close()
+
+# Run a group of independent SQL scripts
+def run_sql_scripts(scripts, db_path, data_date=None, conn=None, incremental=False):
+    """
+    Run independent SQL scripts in order and return how many succeeded.
+    
+    Args:
+        scripts (list): (script path, input tables, output tables) tuples
+        db_path (str): Path to the SQLite database file
+        data_date (str): Batch date for processing (YYYY-MM-DD format)
+        conn (sqlite3.Connection): Open connection to reuse (optional)
+        incremental (bool): Skip scripts whose inputs are unchanged since their last successful run
+    
+    Returns:
+        int: Number of scripts that succeeded or were skipped
+    """
+    results = [
+        run_sql_script(script, db_path, data_date, conn, input_tables if incremental else None, output_tables)
+        for script, input_tables, output_tables in scripts
+    ]
+    
+    return sum(1 for result in results if result["status"] == "success")
+
+# Run transformation scripts
+def run_transformations(cfg, data_date=None, conn=None):
+    """Run all transformation SQL scripts, reusing conn when one is given."""
+    # Get all transformation scripts with the tables they read and write
     transform_scripts = [
-        os.path.join(transform_dir, config['sql']['transform_gsc']),
-        os.path.join(transform_dir, config['sql']['transform_analytics']),
-        os.path.join(transform_dir, config['sql']['transform_rank'])
+        (cfg.transform_gsc, ['stg_gsc_data'], ['tr_gsc_data']),
+        (cfg.transform_analytics, ['stg_analytics_data'], ['tr_analytics_data']),
+        (cfg.transform_rank, ['stg_rank_data'], ['tr_rank_data'])
     ]
     
     # Execute each script
-    success_count = 0
-    for script in transform_scripts:
-        result = execute_sql_file(script, db_path, data_date)
-        if result["status"] == "success":
-            success_count += 1
+    success_count = run_sql_scripts(transform_scripts, cfg.db_path, data_date, conn, cfg.incremental)
     
     return success_count == len(transform_scripts)
 
 # Run join scripts
-def run_joins(config, data_date=None):
-    """Run all join SQL scripts."""
-    db_path = config['database']['path']
-    join_dir = config['sql']['join_dir']
-    
-    # Get all join scripts
+def run_joins(cfg, data_date=None, conn=None):
+    """Run all join SQL scripts, reusing conn when one is given."""
+    # Get all join scripts with the tables they read and write
     join_scripts = [
-        os.path.join(join_dir, config['sql']['join_gsc_analytics']),
-        os.path.join(join_dir, config['sql']['join_gsc_rank'])
+        (cfg.join_gsc_analytics, ['tr_gsc_data', 'tr_analytics_data'], ['int_gsc_analytics']),
+        (cfg.join_gsc_rank, ['tr_gsc_data', 'tr_rank_data'], ['int_gsc_rank'])
     ]
     
     # Execute each script
-    success_count = 0
-    for script in join_scripts:
-        result = execute_sql_file(script, db_path, data_date)
-        if result["status"] == "success":
-            success_count += 1
+    success_count = run_sql_scripts(join_scripts, cfg.db_path, data_date, conn, cfg.incremental)
     
     return success_count == len(join_scripts)
 
 # Create fact table
-def create_fact_table(config, data_date=None):
-    """Create the final fact table."""
-    db_path = config['database']['path']
-    fact_dir = config['sql']['fact_dir']
-    fact_script = os.path.join(fact_dir, config['sql']['fact_seo'])
+def create_fact_table(cfg, data_date=None, conn=None):
+    """Create the final fact table, reusing conn when one is given."""
+    # The fact table reads both join tables
+    input_tables = ['int_gsc_analytics', 'int_gsc_rank'] if cfg.incremental else None
+    result = run_sql_script(cfg.fact_seo, cfg.db_path, data_date, conn, input_tables, ['fact_seo_performance'])
+    return result["status"] == "success"
+
+# Run transformations, joins and the fact table as one script
+def run_stages_fused(cfg, data_date=None, conn=None):
+    """Run the transformation, join and fact table scripts concatenated into one script, reusing conn when one is given."""
+    # Scripts in dependency order; each is split on its own so a missing final semicolon can't merge scripts
+    scripts = [
+        cfg.transform_gsc, cfg.transform_analytics, cfg.transform_rank,
+        cfg.join_gsc_analytics, cfg.join_gsc_rank,
+        cfg.fact_seo
+    ]
+    try:
+        statements = [statement for script in scripts for statement in read_sql_statements(script)]
+    except OSError as e:
+        logging.error("Failed to read SQL scripts: %s", e)
+        return False
     
-    result = execute_sql_file(fact_script, db_path, data_date)
+    result = execute_sql_script(statements, "fused transformation, join and fact table scripts", cfg.db_path, data_date, conn=conn)
     return result["status"] == "success"
 
-# Export fact table to CSV
-def export_fact_table(config):
-    """Export the fact table to CSV."""
-    if not config['output'].get('export_csv', False):
-        logging.info("CSV export disabled in configuration")
+# Export a table to CSV through Arrow
+def export_table_with_arrow(db_path, table_name, export_path):
+    """Export a table to CSV by reading Arrow record batches over ADBC and writing them with pyarrow's CSV writer."""
+    with adbc_sqlite.connect(db_path) as conn:
+        with conn.cursor() as cursor:
+            for pragma in EXPORT_PRAGMAS:
+                cursor.execute(pragma)
+            cursor.execute(f"SELECT * FROM {table_name}")
+            reader = cursor.fetch_record_batch()
+            
+            # Match the csv module's line endings
+            write_options = pacsv.WriteOptions(eol="\r\n")
+            with pacsv.CSVWriter(export_path, reader.schema, write_options=write_options) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+
+# Export a table to Parquet through Arrow
+def export_table_to_parquet(db_path, table_name, export_path):
+    """Export a table to Parquet by reading Arrow record batches over ADBC and writing them with pyarrow's Parquet writer."""
+    with adbc_sqlite.connect(db_path) as conn:
+        with conn.cursor() as cursor:
+            for pragma in EXPORT_PRAGMAS:
+                cursor.execute(pragma)
+            cursor.execute(f"SELECT * FROM {table_name}")
+            reader = cursor.fetch_record_batch()
+            
+            with pq.ParquetWriter(export_path, reader.schema, compression="snappy") as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+
+# Find the numeric columns of a table from its declared types
+def get_numeric_columns(conn, table_name):
+    """Return (column index, is integer) pairs for the columns with INTEGER or REAL affinity, in column order."""
+    numeric_columns = []
+    for index, _, declared_type, *_ in conn.execute(f"PRAGMA table_info({table_name})"):
+        declared_type = (declared_type or "").upper()
+        # SQLite's affinity rules: INT means integer, REAL/FLOA/DOUB mean real
+        if "INT" in declared_type:
+            numeric_columns.append((index, True))
+        elif any(name in declared_type for name in ("REAL", "FLOA", "DOUB")):
+            numeric_columns.append((index, False))
+    return numeric_columns
+
+# Convert the numeric columns of a batch to NumPy arrays
+def _numeric_column_arrays(rows, numeric_columns):
+    """Return one float64 array per numeric column, with NaN wherever a value is NULL or not a number."""
+    return [
+        np.fromiter(
+            (value if type(value) in (int, float) else np.nan for value in (row[index] for row in rows)),
+            dtype=np.float64, count=len(rows)
+        )
+        for index, _ in numeric_columns
+    ]
+
+# Write the rows of an executed cursor to a CSV writer
+def _export_rows(cursor, writer, post_fn=None, numeric_columns=None):
+    """
+    Stream the cursor's result to the CSV writer in batches, optionally post-processing each batch first.
+    
+    Args:
+        cursor (sqlite3.Cursor): Cursor with an executed SELECT; its arraysize sets the batch size
+        writer (csv.writer): Writer that receives the rows
+        post_fn (callable): Optional hook applied to each batch. A numba.njit function receives one float64
+            NumPy array per entry of numeric_columns, in that order, with NaN for NULL, and updates them in
+            place; any other callable receives the list of rows and returns the rows to write.
+        numeric_columns (list): (column index, is integer) pairs from get_numeric_columns; required for a
+            numba.njit hook so it gets the same columns for every batch
+    """
+    compiled = post_fn is not None and is_jitted is not None and is_jitted(post_fn)
+    if compiled and numeric_columns is None:
+        raise ValueError("A compiled post_fn requires numeric_columns")
+    
+    # Stream data in batches so memory stays bounded by the batch size
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            break
+        
+        if compiled:
+            # Run the compiled hook on column arrays, then write the updated values back into the rows;
+            # NaN keeps the original cell, so NULLs and non-numeric values pass through unchanged
+            arrays = _numeric_column_arrays(rows, numeric_columns)
+            post_fn(*arrays)
+            columns = [list(values) for values in zip(*rows)]
+            for (index, is_integer), array in zip(numeric_columns, arrays):
+                columns[index] = [
+                    original if value != value else (int(value) if is_integer else value)
+                    for original, value in zip(columns[index], array.tolist())
+                ]
+            rows = list(zip(*columns))
+        elif post_fn is not None:
+            rows = post_fn(rows)
+        
+        writer.writerows(rows)
+
+# Export fact table to CSV and/or Parquet
+def export_fact_table(cfg, conn=None, post_fn=None):
+    """Export the fact table to CSV and/or Parquet, reusing conn when one is given; post_fn is passed to _export_rows for the CSV export."""
+    if not cfg.export_csv and not cfg.export_parquet:
+        logging.info("Export disabled in configuration")
         return True
     
     try:
-        db_path = config['database']['path']
-        export_dir = config['output']['export_dir']
+        db_path = cfg.db_path
         
         # Create export directory if it doesn't exist
-        os.makedirs(export_dir, exist_ok=True)
-        
-        # Connect to database
-        conn = sqlite3.connect(db_path)
+        os.makedirs(cfg.export_dir, exist_ok=True)
+        
+        export_base = os.path.join(cfg.export_dir, f"fact_seo_performance_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        
+        # Parquet export needs the optional Arrow packages
+        if cfg.export_parquet:
+            if adbc_sqlite is None:
+                logging.error("Parquet export requires the pyarrow and adbc-driver-sqlite packages")
+                return False
+            parquet_path = export_base + ".parquet"
+            export_table_to_parquet(db_path, "fact_seo_performance", parquet_path)
+            logging.info("Exported fact table to %s", parquet_path)
+        
+        if not cfg.export_csv:
+            return True
+        
+        export_path = export_base + ".csv"
+        
+        # Use the Arrow export only when configured: pyarrow quotes every string and writes 0.0 as 0, so its
+        # CSV differs from the csv module's; it never materializes Python rows, so it also can't run a hook
+        if cfg.export_csv_arrow and post_fn is None:
+            if adbc_sqlite is None:
+                logging.warning("Arrow CSV export requires the pyarrow and adbc-driver-sqlite packages, using csv module")
+            else:
+                try:
+                    export_table_with_arrow(db_path, "fact_seo_performance", export_path)
+                    logging.info("Exported fact table to %s", export_path)
+                    return True
+                except Exception as e:
+                    logging.warning("Arrow export failed, falling back to csv module: %s", e)
+        
+        # Connect to database unless the caller supplied a connection
+        own_connection = conn is None
+        if own_connection:
+            conn = sqlite3.connect(db_path)
+        for pragma in EXPORT_PRAGMAS:
+            conn.execute(pragma)
         cursor = conn.cursor()
         
-        # Get column names
-        cursor.execute("PRAGMA table_info(fact_seo_performance)")
-        columns = [row[1] for row in cursor.fetchall()]
-        
-        # Export data
-        export_path = os.path.join(export_dir, f"fact_seo_performance_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        # Export data; column names come from the result's description
+        cursor.arraysize = EXPORT_BATCH_SIZE
         cursor.execute("SELECT * FROM fact_seo_performance")
+        columns = [description[0] for description in cursor.description]
+        
+        # A compiled hook gets a fixed set of numeric columns, taken from the declared column types
+        numeric_columns = get_numeric_columns(conn, "fact_seo_performance") if post_fn is not None else None
         
-        with open(export_path, 'w', newline='') as csvfile:
+        with open(export_path, 'w', newline='', buffering=1 << 20) as csvfile:
             writer = csv.writer(csvfile)
             writer.writerow(columns)  # Write header
-            writer.writerows(cursor.fetchall())  # Write data
+            _export_rows(cursor, writer, post_fn, numeric_columns)
         
-        conn.close()
+        if own_connection:
+            conn.close()
         
-        logging.info(f"Exported fact table to {export_path}")
+        logging.info("Exported fact table to %s", export_path)
         return True
         
     except Exception as e:
-        logging.error(f"Error exporting fact table: {e}")
-        logging.debug(traceback.format_exc())
+        logging.error("Error exporting fact table: %s", e)
+        # Only build the traceback text when it will actually be logged
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(traceback.format_exc())
         return False
 
 # Note: Schema creation has been moved to a separate script (seo_create_ddl.py)
@@ -167,20 +488,24 @@ def export_fact_table(config):
 # Main pipeline function
 def run_pipeline(config, data_date=None):
     """Run the complete ETL pipeline."""
+    conn = None
     try:
         # Start time
         start_time = datetime.now()
-        logging.info(f"Starting SEO pipeline at {start_time}")
+        logging.info("Starting SEO pipeline at %s", start_time)
+        
+        # Resolve configuration once for all steps
+        cfg = get_pipeline_settings(config)
         
         # Use data_date from config if not provided as parameter
-        if not data_date and 'data_date' in config.get('processing', {}):
-            data_date = config['processing']['data_date']
+        if not data_date:
+            data_date = cfg.data_date
         
         # Default to current date if still not set
         if not data_date:
             data_date = datetime.now().strftime('%Y-%m-%d')
             
-        logging.info(f"Using data_date: {data_date}")
+        logging.info("Using data_date: %s", data_date)
         
         # Note: Schema creation should be done once by running seo_create_ddl.py
         # This pipeline assumes the tables already exist
@@ -188,96 +513,100 @@ def run_pipeline(config, data_date=None):
         # 1. Process datasets
         logging.info("Step 1: Processing datasets")
         
-        # Process GSC data
-        logging.info("Step 1.1: Processing GSC data")
-        gsc_dir = os.path.join(config['input']['data_dir'], config['input']['gsc_dir'])
-        gsc_prefix = config['input']['gsc_prefix']
-        gsc_result = util_ingest_csv_to_sqlite(gsc_dir, gsc_prefix, 'stg_gsc_data', config['database']['path'], data_date)
-        
-        # Consider only "success" and "skipped" as successful outcomes
-        # For "partial", we require at least one file to be successfully processed
-        gsc_success = gsc_result["status"] in ["success", "skipped"] or \
-                      (gsc_result["status"] == "partial" and gsc_result.get("succeeded", 0) > 0)
-        
-        # Fail fast if GSC data ingestion failed completely
-        if not gsc_success:
-            logging.error(f"GSC data ingestion failed: {gsc_result.get('message', 'Unknown error')}")
-            logging.error("Pipeline execution stopped. Please fix data ingestion issues before proceeding.")
-            return False
-        
-        # Process Analytics data
-        logging.info("Step 1.2: Processing Analytics data")
-        analytics_dir = os.path.join(config['input']['data_dir'], config['input']['analytics_dir'])
-        analytics_prefix = config['input']['analytics_prefix']
-        analytics_result = util_ingest_csv_to_sqlite(analytics_dir, analytics_prefix, 'stg_analytics_data', config['database']['path'], data_date)
-        
-        analytics_success = analytics_result["status"] in ["success", "skipped"] or \
-                            (analytics_result["status"] == "partial" and analytics_result.get("succeeded", 0) > 0)
-        
-        # Fail fast if Analytics data ingestion failed completely
-        if not analytics_success:
-            logging.error(f"Analytics data ingestion failed: {analytics_result.get('message', 'Unknown error')}")
-            logging.error("Pipeline execution stopped. Please fix data ingestion issues before proceeding.")
-            return False
-        
-        # Process Rank data
-        logging.info("Step 1.3: Processing Rank data")
-        rank_dir = os.path.join(config['input']['data_dir'], config['input']['rank_dir'])
-        rank_prefix = config['input']['rank_prefix']
-        rank_result = util_ingest_csv_to_sqlite(rank_dir, rank_prefix, 'stg_rank_data', config['database']['path'], data_date)
-        
-        rank_success = rank_result["status"] in ["success", "skipped"] or \
-                      (rank_result["status"] == "partial" and rank_result.get("succeeded", 0) > 0)
-        
-        # Fail fast if Rank data ingestion failed completely
-        if not rank_success:
-            logging.error(f"Rank data ingestion failed: {rank_result.get('message', 'Unknown error')}")
-            logging.error("Pipeline execution stopped. Please fix data ingestion issues before proceeding.")
-            return False
+        # Datasets are ingested one at a time: each ingestion holds SQLite's single write lock
+        # while it parses and inserts, so concurrent ingestions would only queue behind each other
+        datasets = [
+            ("GSC", "Step 1.1", cfg.gsc_dir, cfg.gsc_prefix, 'stg_gsc_data'),
+            ("Analytics", "Step 1.2", cfg.analytics_dir, cfg.analytics_prefix, 'stg_analytics_data'),
+            ("Rank", "Step 1.3", cfg.rank_dir, cfg.rank_prefix, 'stg_rank_data'),
+        ]
+        
+        ingestion_results = []
+        for name, step, data_dir, prefix, table_name in datasets:
+            logging.info("%s: Processing %s data", step, name)
+            result = util_ingest_csv_to_sqlite(data_dir, prefix, table_name, cfg.db_path, data_date)
+            ingestion_results.append(result)
+            
+            # Consider only "success" and "skipped" as successful outcomes
+            # For "partial", we require at least one file to be successfully processed
+            success = result["status"] in ["success", "skipped"] or \
+                      (result["status"] == "partial" and result.get("succeeded", 0) > 0)
+            
+            # Fail fast if data ingestion failed completely
+            if not success:
+                logging.error("%s data ingestion failed: %s", name, result.get('message', 'Unknown error'))
+                logging.error("Pipeline execution stopped. Please fix data ingestion issues before proceeding.")
+                return False
         
         # Log a warning if any dataset had partial success
-        if gsc_result["status"] == "partial" or analytics_result["status"] == "partial" or rank_result["status"] == "partial":
+        if any(result["status"] == "partial" for result in ingestion_results):
             logging.warning("Some files failed to process completely. Check logs for details.")
         
-        # 2. Run transformations
-        logging.info("Step 2: Running transformations")
-        transform_success = run_transformations(config, data_date)
-        
-        if not transform_success:
-            logging.error("Transformation step failed")
-            return False
-        
-        # 3. Run joins
-        logging.info("Step 3: Running joins")
-        join_success = run_joins(config, data_date)
+        # Open one connection shared by the transform, join, fact and export steps, waiting on any other writer
+        conn = sqlite3.connect(cfg.db_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        configure_connection(conn)
         
-        if not join_success:
-            logging.error("Join step failed")
-            return False
+        # Run steps 2-4 in one transaction so the database is synced once instead of once per script
+        conn.execute("BEGIN IMMEDIATE")
         
-        # 4. Create fact table
-        logging.info("Step 4: Creating fact table")
-        fact_success = create_fact_table(config, data_date)
+        if cfg.fused_stages:
+            # 2-4. Run transformations, joins and the fact table as one combined script
+            logging.info("Steps 2-4: Running fused transformation, join and fact table scripts")
+            fact_success = run_stages_fused(cfg, data_date, conn)
+            
+            if not fact_success:
+                logging.error("Fused transformation, join and fact table step failed")
+                return False
+        else:
+            # 2. Run transformations
+            logging.info("Step 2: Running transformations")
+            transform_success = run_transformations(cfg, data_date, conn)
+            
+            if not transform_success:
+                logging.error("Transformation step failed")
+                return False
+            
+            # 3. Run joins
+            logging.info("Step 3: Running joins")
+            join_success = run_joins(cfg, data_date, conn)
+            
+            if not join_success:
+                logging.error("Join step failed")
+                return False
+            
+            # 4. Create fact table
+            logging.info("Step 4: Creating fact table")
+            fact_success = create_fact_table(cfg, data_date, conn)
+            
+            if not fact_success:
+                logging.error("Fact table creation failed")
+                return False
         
-        if not fact_success:
-            logging.error("Fact table creation failed")
-            return False
+        conn.commit()
         
         # 5. Export results
         logging.info("Step 5: Exporting results")
-        export_success = export_fact_table(config)
+        export_success = export_fact_table(cfg, conn)
         
         # End time and summary
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
-        logging.info(f"Pipeline completed at {end_time} (duration: {duration:.2f} seconds)")
+        logging.info("Pipeline completed at %s (duration: %.2f seconds)", end_time, duration)
         
         return fact_success and export_success
         
     except Exception as e:
-        logging.error(f"Pipeline failed with error: {e}")
-        logging.debug(traceback.format_exc())
+        logging.error("Pipeline failed with error: %s", e)
+        # Only build the traceback text when it will actually be logged
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(traceback.format_exc())
         return False
+    finally:
+        if conn is not None:
+            # Discard the uncommitted work of a failed step
+            if conn.in_transaction:
+                conn.rollback()
+            conn.close()
 
 # Command-line interface
 def main():
@@ -288,16 +617,12 @@ def main():
     parser.add_argument('--data-date', help='Batch date for processing (YYYY-MM-DD format)')
     args = parser.parse_args()
     
-    # Setup logging
-    logger = setup_logging(args.log_level, args.log_file)
-    
-    # Load configuration
+    # Load configuration; until logging is set up, errors reach stderr through logging's last-resort handler
     config = load_config(args.config)
     
-    # Update log settings from config if not overridden
-    if not args.log_file and 'log_file' in config.get('processing', {}):
-        log_file = config['processing']['log_file']
-        setup_logging(args.log_level, log_file)
+    # Setup logging once, preferring the command-line log file over the one in the config
+    log_file = args.log_file or config.get('processing', {}).get('log_file')
+    setup_logging(args.log_level, log_file)
     
     # Run pipeline
     success = run_pipeline(config, args.data_date)
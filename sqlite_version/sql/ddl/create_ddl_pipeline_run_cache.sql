@@ -0,0 +1,23 @@
+-- SQL Script to create the incremental cache tables
+-- pipeline_run_cache stores the input hash of the last successful run of each SQL script per batch date
+-- pipeline_table_generation counts the rewrites of each table written by a SQL script per batch date
+-- Note: This script is intended for one-time schema creation or schema updates;
+-- seo_pipeline.py also creates these tables on first use when processing.incremental is enabled
+DROP TABLE IF EXISTS pipeline_run_cache;
+CREATE TABLE IF NOT EXISTS pipeline_run_cache (
+  script_name TEXT,
+  data_date TEXT,    -- Batch date of the process
+  cache_key TEXT,    -- Hash of the SQL script, batch date and input table state
+  status TEXT,
+  run_date TIMESTAMP, -- Timestamp when record was created
+  PRIMARY KEY (script_name, data_date)
+);
+
+DROP TABLE IF EXISTS pipeline_table_generation;
+CREATE TABLE IF NOT EXISTS pipeline_table_generation (
+  table_name TEXT,
+  data_date TEXT,    -- Batch date of the process
+  generation INTEGER, -- Incremented every time a SQL script rewrites the table for the batch date
+  run_date TIMESTAMP, -- Timestamp when record was last updated
+  PRIMARY KEY (table_name, data_date)
+);
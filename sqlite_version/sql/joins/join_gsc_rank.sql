@@ -1,6 +1,6 @@
 -- Join GSC data with Rank data
 -- This shows the differential between impressions in GSC and available search volume
--- Uses DATA_DATE() function provided by execute_sqlite_sql.py
+-- Uses DATA_DATE() placeholder substituted by execute_sqlite_sql.py
 
 -- Delete existing records for the current data_date to handle reruns
 DELETE FROM int_gsc_rank WHERE data_date = DATA_DATE();
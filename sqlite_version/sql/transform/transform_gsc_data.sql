@@ -1,7 +1,7 @@
 -- Transform GSC data
 -- Clean data and add estimated_traffic field
 -- estimated_traffic is calculated based on clicks, impressions, and position
--- Uses DATA_DATE() function provided by execute_sqlite_sql.py
+-- Uses DATA_DATE() placeholder substituted by execute_sqlite_sql.py
 
 -- Delete existing records for the current data_date to handle reruns
 DELETE FROM tr_gsc_data WHERE data_date = DATA_DATE();
@@ -1,6 +1,6 @@
 -- Transform rank data
 -- Clean data and normalize fields
--- Uses DATA_DATE() function provided by execute_sqlite_sql.py
+-- Uses DATA_DATE() placeholder substituted by execute_sqlite_sql.py
 
 -- Delete existing records for the current data_date to handle reruns
 DELETE FROM tr_rank_data WHERE data_date = DATA_DATE();
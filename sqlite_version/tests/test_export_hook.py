@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for running a compiled numba hook over the rows of the CSV export.
+Usage: python -m unittest discover -s tests (from the sqlite_version directory)
+"""
+
+import io
+import os
+import sys
+import csv
+import sqlite3
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from seo_pipeline import get_numeric_columns, _export_rows
+
+# The compiled hook path is only available with numpy and numba installed
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+@unittest.skipUnless(njit is not None, "numpy and numba are required for compiled export hooks")
+class CompiledExportHookTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("CREATE TABLE fact (page TEXT, clicks INTEGER, ctr REAL, note TEXT)")
+        self.conn.executemany(
+            "INSERT INTO fact (page, clicks, ctr, note) VALUES (?, ?, ?, ?)",
+            [('/a', 1, 0.5, 'x'), ('/b', None, 0.25, 'y'), ('/c', 3, None, 'z')]
+        )
+
+    def tearDown(self):
+        self.conn.close()
+
+    def export(self, post_fn):
+        cursor = self.conn.cursor()
+        # One row per batch, so the hook runs once for every row
+        cursor.arraysize = 1
+        cursor.execute("SELECT * FROM fact ORDER BY page")
+        output = io.StringIO()
+        _export_rows(cursor, csv.writer(output), post_fn, get_numeric_columns(self.conn, "fact"))
+        return list(csv.reader(io.StringIO(output.getvalue())))
+
+    def test_hook_updates_numeric_columns_and_keeps_nulls(self):
+        @njit
+        def double_clicks_scale_ctr(clicks, ctr):
+            for i in range(clicks.size):
+                clicks[i] = clicks[i] * 2
+                ctr[i] = ctr[i] * 10
+
+        self.assertEqual(get_numeric_columns(self.conn, "fact"), [(1, True), (2, False)])
+        self.assertEqual(self.export(double_clicks_scale_ctr), [
+            ['/a', '2', '5.0', 'x'],
+            ['/b', '', '2.5', 'y'],
+            ['/c', '6', '', 'z'],
+        ])
+
+    def test_hook_requires_numeric_columns(self):
+        @njit
+        def noop(clicks, ctr):
+            pass
+
+        cursor = self.conn.execute("SELECT * FROM fact")
+        with self.assertRaises(ValueError):
+            _export_rows(cursor, csv.writer(io.StringIO()), noop)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the pipeline's incremental execution cache.
+Usage: python -m unittest discover -s tests (from the sqlite_version directory)
+"""
+
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from seo_pipeline import load_config, get_pipeline_settings, run_transformations, run_joins, create_fact_table
+from Utilities.execute_sqlite_sql import execute_sql_file
+
+DATA_DATE = '2025-08-30'
+
+class IncrementalCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'seo_assessment.db')
+
+        # Create the schema, except the cache tables, which the pipeline must create on first use
+        ddl_dir = os.path.join(PROJECT_DIR, 'sql', 'ddl')
+        for ddl_file in sorted(os.listdir(ddl_dir)):
+            if ddl_file.endswith('.sql') and 'pipeline_run_cache' not in ddl_file:
+                result = execute_sql_file(os.path.join(ddl_dir, ddl_file), self.db_path, DATA_DATE)
+                self.assertEqual(result["status"], "success", result.get("message"))
+
+        # Load a few staging rows for the batch date
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            "INSERT INTO stg_gsc_data (date, query, page, clicks, impressions, ctr, avg_position, data_date, run_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [('2025-08-01', f'kw{i}', f'/p{i}', i + 1, 100, 0.1, 1 + i, DATA_DATE, DATA_DATE) for i in range(5)]
+        )
+        conn.executemany(
+            "INSERT INTO stg_analytics_data (date, page, pageviews, sessions, conversions, data_date, run_date) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [('2025-08-01', f'/p{i}', 50, 20, 2, DATA_DATE, DATA_DATE) for i in range(5)]
+        )
+        conn.executemany(
+            "INSERT INTO stg_rank_data (date, keyword, url, rank, monthly_search_volume, cpc, data_date, run_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [('2025-08-01', f'kw{i}', f'/p{i}', i + 1, 1000, 1.5, DATA_DATE, DATA_DATE) for i in range(5)]
+        )
+        conn.commit()
+        conn.close()
+
+        config = load_config(os.path.join(PROJECT_DIR, 'config.yml'))
+        config['database']['path'] = self.db_path
+        config['processing']['incremental'] = True
+        for key in ('transform_dir', 'join_dir', 'fact_dir'):
+            config['sql'][key] = os.path.join(PROJECT_DIR, config['sql'][key])
+        self.cfg = get_pipeline_settings(config)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def run_stages(self):
+        """Run the transform, join and fact steps in one transaction, as run_pipeline does."""
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self.assertTrue(run_transformations(self.cfg, DATA_DATE, conn))
+            self.assertTrue(run_joins(self.cfg, DATA_DATE, conn))
+            self.assertTrue(create_fact_table(self.cfg, DATA_DATE, conn))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def sum_estimated_traffic(self, table_name):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(f"SELECT ROUND(SUM(estimated_traffic), 2) FROM {table_name}").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_upstream_script_change_reruns_downstream_scripts(self):
+        self.run_stages()
+        original_traffic = self.sum_estimated_traffic('fact_seo_performance')
+        self.assertTrue(original_traffic)
+
+        # Edit the estimated_traffic formula in a copy of the GSC transform with the same file name
+        edited_dir = os.path.join(self.temp_dir, 'transform')
+        os.makedirs(edited_dir)
+        edited_script = os.path.join(edited_dir, os.path.basename(self.cfg.transform_gsc))
+        with open(self.cfg.transform_gsc) as sql_file:
+            sql_content = sql_file.read()
+        formula = "(1.0 / (1.0 + 0.1 * avg_position))"
+        self.assertIn(formula, sql_content)
+        with open(edited_script, 'w') as sql_file:
+            sql_file.write(sql_content.replace(formula, "(2.0 / (1.0 + 0.1 * avg_position))"))
+        self.cfg.transform_gsc = edited_script
+
+        self.run_stages()
+
+        # The fact table must reflect the edited transform, not a cached earlier run
+        self.assertAlmostEqual(self.sum_estimated_traffic('tr_gsc_data'), 2 * original_traffic, places=1)
+        self.assertAlmostEqual(self.sum_estimated_traffic('fact_seo_performance'), 2 * original_traffic, places=1)
+
+    def test_unchanged_inputs_skip_every_script(self):
+        self.run_stages()
+
+        with self.assertLogs(level='INFO') as logs:
+            self.run_stages()
+        cache_hits = [line for line in logs.output if 'Cache hit' in line]
+        self.assertEqual(len(cache_hits), 6)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Regression tests for matching CSV headers to table columns during ingestion.
+Usage: python -m unittest discover -s tests (from the sqlite_version directory)
+"""
+
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from Utilities.ingest_csv_to_sqlite import ingest_csv_to_sqlite
+from Utilities.execute_sqlite_sql import execute_sql_file
+
+DATA_DATE = '2025-08-30'
+
+class IngestHeaderTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'seo_assessment.db')
+        self.data_dir = os.path.join(self.temp_dir, 'rank')
+        os.makedirs(self.data_dir)
+
+        ddl_dir = os.path.join(PROJECT_DIR, 'sql', 'ddl')
+        for ddl_file in ('create_ddl_rank_data.sql', 'create_ddl_log_file_dtl.sql'):
+            result = execute_sql_file(os.path.join(ddl_dir, ddl_file), self.db_path, DATA_DATE)
+            self.assertEqual(result["status"], "success", result.get("message"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_csv(self, file_name, header, rows):
+        with open(os.path.join(self.data_dir, file_name), 'w', newline='') as csv_file:
+            csv_file.write(header + '\n')
+            for row in rows:
+                csv_file.write(row + '\n')
+
+    def query(self, sql):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_mixed_case_header_matches_table_columns(self):
+        # Columns in a different order and case than the stg_rank_data DDL
+        self.write_csv(
+            'rank_data_1.csv',
+            'Keyword,Date,URL,Rank,Monthly_Search_Volume,CPC',
+            ['seo tools,2025-08-01,/tools,3,1000,1.5']
+        )
+
+        result = ingest_csv_to_sqlite(self.data_dir, 'rank_data', 'stg_rank_data', self.db_path, DATA_DATE)
+
+        self.assertEqual(result["status"], "success", result)
+        self.assertEqual(
+            self.query("SELECT date, keyword, url, rank, monthly_search_volume, cpc, data_date FROM stg_rank_data"),
+            [('2025-08-01', 'seo tools', '/tools', 3, 1000, 1.5, DATA_DATE)]
+        )
+        self.assertEqual(self.query("SELECT status FROM log_file_dtl"), [('completed',)])
+
+    def test_mismatched_header_is_rejected(self):
+        self.write_csv(
+            'rank_data_1.csv',
+            'date,keyword,url,position,monthly_search_volume,cpc',
+            ['2025-08-01,seo tools,/tools,3,1000,1.5']
+        )
+
+        result = ingest_csv_to_sqlite(self.data_dir, 'rank_data', 'stg_rank_data', self.db_path, DATA_DATE)
+
+        self.assertEqual(result["status"], "partial", result)
+        self.assertIn("does not match the columns of stg_rank_data", result["results"][0]["message"])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM stg_rank_data"), [(0,)])
+        self.assertEqual(self.query("SELECT status FROM log_file_dtl"), [('failed',)])
+
+if __name__ == "__main__":
+    unittest.main()